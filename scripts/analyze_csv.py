@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""ContentVersion / ContentDocumentLink CSVの統計を出す開発用スクリプト。
+
+Salesforceからエクスポートした2つのCSVについて、行数・ユニークな
+ContentDocumentId数・LinkedEntityIdのプレフィックス分布・共通の
+ContentDocumentId数を表示する。
+
+CSVの走査・キャッシュまわりの実体はsf_csv_scan.pyにあり、ここは
+エンジンごとの集計と表示だけを持つ。Polarsが入っていれば lazy scan で
+1パス集計し、なければ従来のcsvモジュール実装にフォールバックする。
+"""
+
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from sf_csv_scan import (
+    CV_COLUMNS,
+    cached_scan,
+    cudf,
+    ids_to_u64,
+    np,
+    open_csv_arrow,
+    pa,
+    pc,
+    pl,
+    read_csv_cudf,
+    scan_content_link,
+    scan_content_version,
+    top_k,
+)
+
+
+def analyze_csv_files(cv_path, cdl_path):
+    """2つのCSVの統計と共通ContentDocumentId数を表示する。"""
+    if cudf is not None:
+        _analyze_csv_files_cudf(cv_path, cdl_path)
+    elif pl is not None:
+        _analyze_csv_files_polars(cv_path, cdl_path)
+        _print_common_ids_polars(cv_path, cdl_path)
+    elif pa is not None:
+        cv_uniq, cdl_uniq = _analyze_csv_files_arrow(cv_path, cdl_path)
+        _print_common_ids_arrow(cv_uniq, cdl_uniq)
+    else:
+        # 2ファイルの走査は独立なので並列に流す
+        with ProcessPoolExecutor(2) as ex:
+            f_cv = ex.submit(scan_content_version, cv_path)
+            f_cdl = ex.submit(scan_content_link, cdl_path)
+            cv_scan = f_cv.result()
+            cdl_scan = f_cdl.result()
+        _analyze_csv_files_py(cv_scan, cdl_scan)
+        _print_common_ids_py(cv_scan, cdl_scan)
+
+
+def _analyze_csv_files_cudf(cv_path, cdl_path):
+    """cudfによるGPU実装。全集計が列単位のCUDAカーネルで走る。"""
+    cv = read_csv_cudf(cv_path, ["Id", "Title", "ContentDocumentId"])
+    cv_uniq = cv["ContentDocumentId"].dropna().unique()
+
+    print("=== ContentVersion.csv ===")
+    print(f"行数: {len(cv):,}")
+    print(f"ユニークContentDocumentId数: {len(cv_uniq):,}")
+    print("先頭5行:")
+    for row in cv.head(5).to_pandas().to_dict("records"):
+        print(f"  {row}")
+    del cv  # ステージ間でGPUメモリを返す
+
+    cdl = read_csv_cudf(cdl_path, ["ContentDocumentId", "LinkedEntityId", "IsDeleted"])
+    cdl_uniq = cdl["ContentDocumentId"].dropna().unique()
+    prefixes = cdl["LinkedEntityId"].str.slice(0, 3).value_counts()
+    is_deleted = cdl["IsDeleted"].value_counts()
+
+    print("\n=== ContentDocumentLink.csv ===")
+    print(f"行数: {len(cdl):,}")
+    print(f"ユニークContentDocumentId数: {len(cdl_uniq):,}")
+    print("LinkedEntityIdプレフィックス上位10件:")
+    for prefix, count in prefixes.head(10).to_pandas().items():
+        print(f"  {prefix}: {count:,}件")
+    print("IsDeletedの内訳:")
+    for value, count in is_deleted.to_pandas().items():
+        print(f"  {value}: {count:,}件")
+    print("先頭5行:")
+    for row in cdl.head(5).to_pandas().to_dict("records"):
+        print(f"  {row}")
+    del cdl
+
+    common = int(cv_uniq.isin(cdl_uniq).sum())
+
+    print("\n=== 共通ContentDocumentId ===")
+    print(f"ContentVersion側: {len(cv_uniq):,}件")
+    print(f"ContentDocumentLink側: {len(cdl_uniq):,}件")
+    print(f"共通ContentDocumentId数: {common:,}件")
+    print(f"ContentVersionのみ: {len(cv_uniq) - common:,}件")
+
+
+def _analyze_csv_files_polars(cv_path, cdl_path):
+    """Polars lazy scanで各CSVを1パスずつ集計する。
+
+    projection pushdownにより必要な列だけがパースされ、group-byは
+    マルチスレッドで実行される。
+    """
+    lf_cv = cached_scan(cv_path, CV_COLUMNS)
+    lf_cdl = cached_scan(cdl_path)
+    # 全クエリをまとめて渡すと、Polarsが自前のスレッドプールで
+    # 2ファイルのスキャンを並行にスケジュールする
+    cv_stats, cv_preview, cdl_stats, prefixes, is_deleted, cdl_preview = (
+        pl.collect_all(
+            [
+                lf_cv.select(
+                    pl.len().alias("rows"),
+                    # n_uniqueはnullも1値として数えるので、共通ID集計の
+                    # is_not_nullやフォールバックの if cid: と揃うよう落とす
+                    pl.col("ContentDocumentId").drop_nulls().n_unique().alias("nuniq"),
+                ),
+                lf_cv.select(CV_COLUMNS).head(5),
+                lf_cdl.select(
+                    pl.len().alias("rows"),
+                    pl.col("ContentDocumentId").drop_nulls().n_unique().alias("nuniq"),
+                ),
+                lf_cdl.select(
+                    pl.col("LinkedEntityId").str.slice(0, 3).value_counts(sort=True)
+                ),
+                lf_cdl.select(pl.col("IsDeleted").value_counts(sort=True)),
+                lf_cdl.head(5),
+            ],
+            engine="streaming",
+        )
+    )
+    prefixes = prefixes.unnest("LinkedEntityId")
+    is_deleted = is_deleted.unnest("IsDeleted")
+
+    print("=== ContentVersion.csv ===")
+    print(f"行数: {cv_stats['rows'][0]:,}")
+    print(f"ユニークContentDocumentId数: {cv_stats['nuniq'][0]:,}")
+    print("先頭5行:")
+    for row in cv_preview.iter_rows(named=True):
+        print(f"  {row}")
+
+    print("\n=== ContentDocumentLink.csv ===")
+    print(f"行数: {cdl_stats['rows'][0]:,}")
+    print(f"ユニークContentDocumentId数: {cdl_stats['nuniq'][0]:,}")
+    print("LinkedEntityIdプレフィックス上位10件:")
+    for prefix, count in prefixes.head(10).iter_rows():
+        print(f"  {prefix}: {count:,}件")
+    print("IsDeletedの内訳:")
+    for value, count in is_deleted.iter_rows():
+        print(f"  {value}: {count:,}件")
+    print("先頭5行:")
+    for row in cdl_preview.iter_rows(named=True):
+        print(f"  {row}")
+
+
+def _analyze_csv_files_arrow(cv_path, cdl_path):
+    """pyarrowのストリーミングCSVリーダで1パスずつ集計する。
+
+    マルチスレッドのトークナイザが直接Arrowバッファに書き込み、
+    集計は連続メモリ上のカーネルで行うので、csvモジュールのように
+    フィールドごとにPython文字列を作らない。共通ID集計で再利用できる
+    よう、両ファイルのユニークContentDocumentId配列を返す。
+    """
+    # --- ContentVersion.csv ---
+    reader = open_csv_arrow(cv_path, ["Id", "Title", "ContentDocumentId"])
+    row_count = 0
+    preview = []
+    id_chunks = []
+    for batch in reader:
+        row_count += batch.num_rows
+        if len(preview) < 5:
+            preview.extend(batch.slice(0, 5 - len(preview)).to_pylist())
+        id_chunks.append(batch.column("ContentDocumentId"))
+    # ヘッダのみのCSVではバッチが1つも来ないので、型は明示して渡す
+    cv_uniq = pc.unique(pa.chunked_array(id_chunks, type=pa.string()).drop_null())
+
+    print("=== ContentVersion.csv ===")
+    print(f"行数: {row_count:,}")
+    print(f"ユニークContentDocumentId数: {len(cv_uniq):,}")
+    print("先頭5行:")
+    for row in preview:
+        print(f"  {row}")
+
+    # --- ContentDocumentLink.csv ---
+    reader = open_csv_arrow(
+        cdl_path, ["ContentDocumentId", "LinkedEntityId", "IsDeleted"]
+    )
+    row_count = 0
+    preview = []
+    id_chunks = []
+    prefix_counts = Counter()
+    is_deleted_counts = Counter()
+    for batch in reader:
+        row_count += batch.num_rows
+        if len(preview) < 5:
+            preview.extend(batch.slice(0, 5 - len(preview)).to_pylist())
+        id_chunks.append(batch.column("ContentDocumentId"))
+        vc = pc.value_counts(
+            pc.utf8_slice_codeunits(batch.column("LinkedEntityId"), 0, 3)
+        )
+        for item in vc:
+            prefix_counts[item["values"].as_py()] += item["counts"].as_py()
+        vc = pc.value_counts(batch.column("IsDeleted"))
+        for item in vc:
+            is_deleted_counts[item["values"].as_py()] += item["counts"].as_py()
+    cdl_uniq = pc.unique(pa.chunked_array(id_chunks, type=pa.string()).drop_null())
+
+    print("\n=== ContentDocumentLink.csv ===")
+    print(f"行数: {row_count:,}")
+    print(f"ユニークContentDocumentId数: {len(cdl_uniq):,}")
+    print("LinkedEntityIdプレフィックス上位10件:")
+    for prefix, count in top_k(prefix_counts, 10):
+        print(f"  {prefix}: {count:,}件")
+    print("IsDeletedの内訳:")
+    for value, count in is_deleted_counts.most_common():
+        print(f"  {value}: {count:,}件")
+    print("先頭5行:")
+    for row in preview:
+        print(f"  {row}")
+
+    return cv_uniq, cdl_uniq
+
+
+def _print_common_ids_arrow(cv_uniq, cdl_uniq):
+    """共通ContentDocumentId数をArrowのis_inカーネルで求める。
+
+    集計パスで作ったユニーク配列を受け取るので、CSVは読み直さない。
+    """
+    common = pc.sum(pc.is_in(cv_uniq, value_set=cdl_uniq)).as_py() or 0
+
+    print("\n=== 共通ContentDocumentId ===")
+    print(f"ContentVersion側: {len(cv_uniq):,}件")
+    print(f"ContentDocumentLink側: {len(cdl_uniq):,}件")
+    print(f"共通ContentDocumentId数: {common:,}件")
+    print(f"ContentVersionのみ: {len(cv_uniq) - common:,}件")
+
+
+def _analyze_csv_files_py(cv_scan, cdl_scan):
+    """csvモジュールによるフォールバック実装（Polarsなし環境用）。"""
+    print("=== ContentVersion.csv ===")
+    print(f"カラム: {cv_scan.headers}")
+    print("先頭5行:")
+    for row in cv_scan.preview:
+        print(f"  {row}")
+    print(f"行数: {cv_scan.row_count:,}")
+    print(f"ユニークContentDocumentId数: {len(cv_scan.unique_ids):,}")
+    print(f"例: {cv_scan.id_sample}")
+
+    print("\n=== ContentDocumentLink.csv ===")
+    print(f"カラム: {cdl_scan.headers}")
+    print("先頭5行:")
+    for row in cdl_scan.preview:
+        print(f"  {row}")
+    print(f"行数: {cdl_scan.row_count:,}")
+    print(f"ユニークContentDocumentId数: {len(cdl_scan.unique_ids):,}")
+    print(f"例: {cdl_scan.id_sample}")
+    print("LinkedEntityIdプレフィックス上位10件:")
+    for prefix, count in top_k(cdl_scan.prefix_counts, 10):
+        print(f"  {prefix}: {count:,}件")
+    print("IsDeletedの内訳:")
+    for value, count in cdl_scan.is_deleted_counts.most_common():
+        print(f"  {value}: {count:,}件")
+
+
+def _print_common_ids_polars(cv_path, cdl_path):
+    """共通ContentDocumentId数をsemi-joinで求める。
+
+    Python setを2つ作る代わりにArrowの文字列カラム同士をRust側の
+    マルチスレッドhash joinで突き合わせるので、IDをPyUnicodeとして
+    保持するコストがかからない。
+    """
+    lf_cv = (
+        cached_scan(cv_path, CV_COLUMNS)
+        .select("ContentDocumentId")
+        .filter(pl.col("ContentDocumentId").is_not_null())
+        .unique()
+    )
+    lf_cdl = (
+        cached_scan(cdl_path)
+        .select("ContentDocumentId")
+        .filter(pl.col("ContentDocumentId").is_not_null())
+        .unique()
+    )
+    cv_count, cdl_count, common, cv_only = (
+        df.item()
+        for df in pl.collect_all(
+            [
+                lf_cv.select(pl.len()),
+                lf_cdl.select(pl.len()),
+                lf_cv.join(lf_cdl, on="ContentDocumentId", how="semi").select(
+                    pl.len()
+                ),
+                lf_cv.join(lf_cdl, on="ContentDocumentId", how="anti").select(
+                    pl.len()
+                ),
+            ],
+            engine="streaming",
+        )
+    )
+
+    print("\n=== 共通ContentDocumentId ===")
+    print(f"ContentVersion側: {cv_count:,}件")
+    print(f"ContentDocumentLink側: {cdl_count:,}件")
+    print(f"共通ContentDocumentId数: {common:,}件")
+    print(f"ContentVersionのみ: {cv_only:,}件")
+
+
+def _print_common_ids_py(cv_scan, cdl_scan):
+    """ContentVersionとContentDocumentLinkの共通ContentDocumentId数を表示する。"""
+    cv_ids = cv_scan.unique_ids
+    cdl_ids = cdl_scan.unique_ids
+    cdl_count = len(cdl_ids)
+
+    if np is not None:
+        # 60B超/件のPython文字列ではなく8B/件のuint64キーで
+        # ソート済み配列同士のマージとして交差を取る
+        cv_u64 = ids_to_u64(cv_ids)
+        cdl_u64 = ids_to_u64(cdl_ids)
+        common_count = np.intersect1d(cv_u64, cdl_u64, assume_unique=True).size
+    else:
+        # 両setはScanResultとしてすでに揃っているので、素直に交差を取る
+        common_count = len(cv_ids & cdl_ids)
+
+    print("\n=== 共通ContentDocumentId ===")
+    print(f"ContentVersion側: {len(cv_ids):,}件")
+    print(f"ContentDocumentLink側: {cdl_count:,}件")
+    print(f"共通ContentDocumentId数: {common_count:,}件")
+    print(f"ContentVersionのみ: {len(cv_ids) - common_count:,}件")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="ContentVersion/ContentDocumentLink CSVの統計を表示する",
+        epilog=(
+            "ベンチマーク時はCSVを/dev/shm等のramdiskへコピーしてから"
+            "パスを渡すと、ディスク読み込みのブレを除外できる"
+        ),
+    )
+    parser.add_argument("--cv-path", type=Path, required=True,
+                        help="ContentVersion.csvのパス")
+    parser.add_argument("--cdl-path", type=Path, required=True,
+                        help="ContentDocumentLink.csvのパス")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    analyze_csv_files(args.cv_path, args.cdl_path)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""マッピング対象オブジェクトに紐づくContentDocumentIdを調べる開発用スクリプト。
+
+ContentDocumentLink.csvからLinkedEntityIdが対象プレフィックス
+（Account/Contactなど）で始まる行を抽出し、そのContentDocumentIdが
+ContentVersion.csvに何件存在するかを突き合わせる。
+
+Polarsが入っていればプレフィックスフィルタをCSVスキャンまで
+押し下げたsemi-joinで集計し、なければcsvモジュールにフォールバックする。
+"""
+
+import argparse
+import csv
+from pathlib import Path
+
+from sf_csv_scan import (
+    CV_COLUMNS,
+    HAVE_NUMBA,
+    READ_BUFFER,
+    advise_sequential,
+    cached_scan,
+    cudf,
+    njit,
+    np,
+    open_csv_arrow,
+    pa,
+    pc,
+    pcsv,
+    pl,
+    read_csv_cudf,
+    scan_content_link,
+)
+
+
+# マッピング対象のSalesforceオブジェクトプレフィックス（Account/Contact）
+TARGET_PREFIXES = ("001", "003")
+
+
+def analyze_target_ids(cv_path, cdl_path):
+    """対象プレフィックス行の件数とContentVersionとの一致数を表示する。"""
+    if cudf is not None:
+        _analyze_target_ids_cudf(cv_path, cdl_path)
+    elif pl is not None:
+        _analyze_target_ids_polars(cv_path, cdl_path)
+    elif pa is not None and np is not None and HAVE_NUMBA:
+        _analyze_target_ids_numba(cv_path, cdl_path)
+    elif pa is not None:
+        _analyze_target_ids_arrow(cv_path, cdl_path)
+    else:
+        _analyze_target_ids_py(cv_path, cdl_path)
+
+
+def _analyze_target_ids_cudf(cv_path, cdl_path):
+    """cudfによるGPU実装。フィルタも突き合わせもCUDAカーネルで走る。"""
+    cdl = read_csv_cudf(cdl_path, ["ContentDocumentId", "LinkedEntityId"])
+    hit = cdl["LinkedEntityId"].str.slice(0, 3).isin(list(TARGET_PREFIXES))
+    target_rows = int(hit.sum())
+    target_uniq = cdl["ContentDocumentId"][hit].dropna().unique()
+    del cdl  # ステージ間でGPUメモリを返す
+
+    cv = read_csv_cudf(cv_path, ["ContentDocumentId"])
+    cv_uniq = cv["ContentDocumentId"].dropna().unique()
+    del cv
+
+    matched = int(target_uniq.isin(cv_uniq).sum())
+
+    print(f"=== 対象プレフィックス {TARGET_PREFIXES} ===")
+    print(f"対象行数: {target_rows:,}件")
+    print(f"対象ユニークContentDocumentId数: {len(target_uniq):,}件")
+    print(f"ContentVersionと一致: {matched:,}件")
+    print(f"ContentVersionに存在しない: {len(target_uniq) - matched:,}件")
+
+
+def _analyze_target_ids_polars(cv_path, cdl_path):
+    """プレフィックスフィルタを押し下げたlazyスキャン + semi-join。"""
+    lf_cdl = (
+        cached_scan(cdl_path)
+        .filter(pl.col("LinkedEntityId").str.slice(0, 3).is_in(list(TARGET_PREFIXES)))
+        .select("ContentDocumentId")
+        .filter(pl.col("ContentDocumentId").is_not_null())
+    )
+    target_rows = lf_cdl.select(pl.len()).collect(engine="streaming").item()
+    lf_cdl_uniq = lf_cdl.unique()
+    target_unique = lf_cdl_uniq.select(pl.len()).collect(engine="streaming").item()
+
+    lf_cv = (
+        cached_scan(cv_path, CV_COLUMNS)
+        .select("ContentDocumentId")
+        .filter(pl.col("ContentDocumentId").is_not_null())
+        .unique()
+    )
+    matched = (
+        lf_cdl_uniq.join(lf_cv, on="ContentDocumentId", how="semi")
+        .select(pl.len())
+        .collect(engine="streaming")
+        .item()
+    )
+    unmatched = (
+        lf_cdl_uniq.join(lf_cv, on="ContentDocumentId", how="anti")
+        .select(pl.len())
+        .collect(engine="streaming")
+        .item()
+    )
+
+    print(f"=== 対象プレフィックス {TARGET_PREFIXES} ===")
+    print(f"対象行数: {target_rows:,}件")
+    print(f"対象ユニークContentDocumentId数: {target_unique:,}件")
+    print(f"ContentVersionと一致: {matched:,}件")
+    print(f"ContentVersionに存在しない: {unmatched:,}件")
+
+
+def _analyze_target_ids_arrow(cv_path, cdl_path):
+    """pyarrowのストリーミングCSVリーダによる実装（Polarsなし環境用）。
+
+    プレフィックス比較とフィルタをArrowカーネルでバッチごとに行い、
+    行単位のPythonオブジェクトを作らない。
+    """
+    reader = open_csv_arrow(cdl_path, ["ContentDocumentId", "LinkedEntityId"])
+    prefix_set = pa.array(list(TARGET_PREFIXES))
+    target_rows = 0
+    id_chunks = []
+    for batch in reader:
+        hit = pc.is_in(
+            pc.utf8_slice_codeunits(batch.column("LinkedEntityId"), 0, 3),
+            value_set=prefix_set,
+        )
+        target_rows += pc.sum(hit).as_py() or 0
+        id_chunks.append(batch.column("ContentDocumentId").filter(hit))
+    # ヘッダのみのCSVではバッチが1つも来ないので、型は明示して渡す
+    target_uniq = pc.unique(pa.chunked_array(id_chunks, type=pa.string()).drop_null())
+
+    reader = open_csv_arrow(cv_path, ["ContentDocumentId"])
+    cv_chunks = [batch.column("ContentDocumentId") for batch in reader]
+    cv_uniq = pc.unique(pa.chunked_array(cv_chunks, type=pa.string()).drop_null())
+
+    matched = pc.sum(pc.is_in(target_uniq, value_set=cv_uniq)).as_py() or 0
+
+    print(f"=== 対象プレフィックス {TARGET_PREFIXES} ===")
+    print(f"対象行数: {target_rows:,}件")
+    print(f"対象ユニークContentDocumentId数: {len(target_uniq):,}件")
+    print(f"ContentVersionと一致: {matched:,}件")
+    print(f"ContentVersionに存在しない: {len(target_uniq) - matched:,}件")
+
+
+# 先頭4バイトをリトルエンディアンで読んだときの"001"/"003"。
+# TARGET_PREFIXESを変えたらここの定数も合わせること
+_PREFIX_MASK = 0x00FFFFFF
+_PREFIX_001 = 0x00313030
+_PREFIX_003 = 0x00333030
+
+
+def prefix_heads_u32(leids):
+    """|S18配列の各要素の先頭4バイトをuint32として取り出す。"""
+    raw = leids.view(np.uint8).reshape(leids.size, 18)
+    return np.ascontiguousarray(raw[:, :4]).view(np.uint32).ravel()
+
+
+@njit(cache=True)
+def select_targets(heads, cdids, out):
+    """プレフィックスが001/003の行のContentDocumentIdをoutに詰める。
+
+    3バイトの個別比較ではなく、先頭4バイトを1つのuint32として
+    マスク+等値比較するSWAR形にして、行あたり1ロード2比較で済ませる。
+    ヒット数を返す。
+    """
+    k = 0
+    for i in range(heads.size):
+        m = heads[i] & _PREFIX_MASK
+        if m == _PREFIX_001 or m == _PREFIX_003:
+            out[k] = cdids[i]
+            k += 1
+    return k
+
+
+def _read_columns_s18(path, columns):
+    """CSVの指定列を|S18固定幅バイト配列として読み込む。
+
+    Salesforce IDは15桁と18桁が混在するためArrowのfixed_size_binary
+    には直接キャストできず、S18にパディングして揃える。
+    """
+    reader = pcsv.open_csv(
+        path,
+        read_options=pcsv.ReadOptions(block_size=64 << 20),
+        convert_options=pcsv.ConvertOptions(include_columns=columns),
+    )
+    table = reader.read_all()
+    # 0行のCSVでは列がnull型で推論され、fill_nullがArrowInvalidに
+    # なるので、先にstringへキャストして型を確定させる
+    return tuple(
+        np.array(
+            pc.fill_null(table.column(c).cast(pa.string()), "").to_pylist(),
+            dtype="S18",
+        )
+        for c in columns
+    )
+
+
+def _analyze_target_ids_numba(cv_path, cdl_path):
+    """列をバイト配列に取り出し、njitカーネルで抽出する実装。"""
+    cdids, leids = _read_columns_s18(
+        cdl_path, ["ContentDocumentId", "LinkedEntityId"]
+    )
+    out = np.empty_like(cdids)
+    target_rows = select_targets(prefix_heads_u32(leids), cdids, out)
+    target_uniq = np.unique(out[:target_rows])
+
+    (cv_ids,) = _read_columns_s18(cv_path, ["ContentDocumentId"])
+    cv_uniq = np.unique(cv_ids)
+    matched = int(np.isin(target_uniq, cv_uniq, assume_unique=True).sum())
+
+    print(f"=== 対象プレフィックス {TARGET_PREFIXES} ===")
+    print(f"対象行数: {target_rows:,}件")
+    print(f"対象ユニークContentDocumentId数: {target_uniq.size:,}件")
+    print(f"ContentVersionと一致: {matched:,}件")
+    print(f"ContentVersionに存在しない: {target_uniq.size - matched:,}件")
+
+
+def _analyze_target_ids_py(cv_path, cdl_path):
+    """csvモジュールによるフォールバック実装（Polarsなし環境用）。
+
+    CDL側はsf_csv_scanのプレフィックスフィルタ付きスキャンを使う。
+    analyze_csv.pyと同一プロセスで続けて実行しても、メモ化により
+    同じファイルを走査し直さない。
+    """
+    cdl_scan = scan_content_link(cdl_path, prefix_filter=TARGET_PREFIXES)
+    target_record_count = sum(
+        cdl_scan.prefix_counts[p] for p in TARGET_PREFIXES
+    )
+    target_content_ids = cdl_scan.unique_ids
+
+    # CV側の巨大なsetを作る必要はない。小さいtarget側のsetに対して
+    # ストリーミングで突き合わせれば、一致分しかメモリに残らない
+    matches = set()
+    with open(cv_path, newline="", encoding="utf-8", buffering=READ_BUFFER) as f:
+        advise_sequential(f)
+        reader = csv.reader(f)
+        cdi = next(reader).index("ContentDocumentId")
+        add = matches.add
+        for row in reader:
+            cid = row[cdi]
+            if cid and cid in target_content_ids:
+                add(cid)
+
+    print(f"=== 対象プレフィックス {TARGET_PREFIXES} ===")
+    print(f"対象行数: {target_record_count:,}件")
+    print(f"対象ユニークContentDocumentId数: {len(target_content_ids):,}件")
+    print(f"ContentVersionと一致: {len(matches):,}件")
+    print(f"ContentVersionに存在しない: {len(target_content_ids - matches):,}件")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="対象オブジェクトに紐づくContentDocumentIdの突き合わせ",
+        epilog=(
+            "ベンチマーク時はCSVを/dev/shm等のramdiskへコピーしてから"
+            "パスを渡すと、ディスク読み込みのブレを除外できる"
+        ),
+    )
+    parser.add_argument("--cv-path", type=Path, required=True,
+                        help="ContentVersion.csvのパス")
+    parser.add_argument("--cdl-path", type=Path, required=True,
+                        help="ContentDocumentLink.csvのパス")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    analyze_target_ids(args.cv_path, args.cdl_path)
@@ -0,0 +1,348 @@
+"""ContentVersion / ContentDocumentLink CSVの共有スキャンモジュール。
+
+analyze_csv.py と analyze_target_ids.py が重複して持っていた
+CSV走査まわりを1箇所に集めたもの。scan_once / cached_scan は
+（パス, mtime）でメモ化しているので、同一プロセスで両方の分析を
+続けて回しても各ファイルは1回しか読まれない。
+
+オプショナルな高速化系の依存（cudf / polars / pyarrow / numpy /
+numba）のimportもここで一括して行い、なければNoneのままにする。
+利用側はこのモジュール経由でそれらを参照する。
+"""
+
+import csv
+import heapq
+import mmap
+import operator
+import os
+import sys
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    import cudf
+except ImportError:
+    cudf = None
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pcsv
+except ImportError:
+    pa = pc = pcsv = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from numba import njit
+
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """numbaなし環境では素のPython関数のまま使う。"""
+        if args and callable(args[0]):
+            return args[0]
+
+        def wrap(func):
+            return func
+
+        return wrap
+
+
+# ContentVersion側はこの3列しか使わない
+CV_COLUMNS = ["Id", "Title", "ContentDocumentId"]
+
+# 8KBごとのread()でシステムコールを積み上げないよう、大きめの
+# バッファで逐次読みする
+READ_BUFFER = 1 << 20
+
+# GPUメモリに一度に載せるCSVのバイト数
+GPU_BYTE_RANGE = 2 << 30
+
+
+def advise_sequential(f):
+    """逐次読みのヒントをカーネルに伝える（対応OSのみ）。
+
+    先読みウィンドウが広がり、パーサがread()で待つ時間と
+    システムコール回数が減る。macOSにはposix_fadviseがないので
+    その場合は何もしない。
+    """
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+
+def top_k(counts, k):
+    """件数の多い順に上位k件の(値, 件数)を返す。
+
+    表示するのは上位だけなので、全エントリをソートせずサイズkの
+    ヒープで選ぶ。
+    """
+    return heapq.nlargest(k, counts.items(), key=operator.itemgetter(1))
+
+
+def count_newlines_mmap(path):
+    """mmapしたファイルの改行数からデータ行数を返す（ヘッダ分を引く）。
+
+    フィールドのパースを一切せずにバイト比較だけで数えるので、
+    ページキャッシュの帯域で回る。NumPyがあれば==とsumのSIMD実装を
+    使い、なければ1MBずつbytes.countする。クォート内改行がない
+    エクスポート前提。行数だけが欲しくてファイルの中身を他で
+    読まない呼び出し側向けで、どのみち全行をパースするscan_onceは
+    自前のループで数える。
+    """
+    size = Path(path).stat().st_size
+    if size == 0:
+        return 0
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            if np is not None:
+                arr = np.frombuffer(mm, dtype=np.uint8)
+                n = int((arr == 0x0A).sum())
+                del arr  # バッファ参照を残すとmm.close()が失敗する
+            else:
+                n = 0
+                chunk = 1 << 20
+                for pos in range(0, size, chunk):
+                    n += mm[pos : pos + chunk].count(b"\n")
+            # 末尾に改行がないエクスポートでは最終行が数えられない
+            if mm[size - 1] != 0x0A:
+                n += 1
+        finally:
+            mm.close()
+    return max(n - 1, 0)
+
+
+@njit(cache=True)
+def b62_to_u64(sfid):
+    """Salesforce IDの先頭15桁をbase-62整数として63bitに畳み込む。
+
+    62^15は2^63を超えるので値は下位63bitにラップするが、ID空間に
+    対して十分広いハッシュとして働くため、件数の突き合わせ用途では
+    衝突は実用上無視できる。64bitではなく63bitに畳むのは、numbaが
+    この関数をint64で型付けしても値が負にならず、そのままuint64
+    配列に詰められるようにするため（64bitマスクだと上位bitが立つ
+    IDが負で返り、np.fromiterがOverflowErrorになる）。
+    """
+    v = 0
+    for i in range(15):
+        c = ord(sfid[i])
+        if c >= 97:  # a-z
+            d = c - 97 + 36
+        elif c >= 65:  # A-Z
+            d = c - 65 + 10
+        else:  # 0-9
+            d = c - 48
+        # int64の積の桁あふれは2^64でラップするので、63bitマスク後の
+        # 値はnumba経由でも純Pythonでも(v*62+d) mod 2^63 で一致する
+        v = (v * 62 + d) & 0x7FFFFFFFFFFFFFFF
+    return v
+
+
+def ids_to_u64(ids):
+    """ID文字列の集合をソート済みuint64配列に変換する。"""
+    arr = np.fromiter(
+        (b62_to_u64(s) for s in ids), dtype=np.uint64, count=len(ids)
+    )
+    arr.sort()
+    return arr
+
+
+@dataclass
+class ScanResult:
+    """scan_onceが1パスで集めるファイル単位の統計。"""
+
+    headers: list
+    preview: list
+    unique_ids: set
+    id_sample: list
+    prefix_counts: Counter
+    is_deleted_counts: Counter
+    row_count: int
+
+
+def scan_once(path, prefix_filter=None):
+    """CSVを1回だけ走査して、全消費側が使う統計をまとめて返す。
+
+    （パス, mtime, フィルタ）でメモ化しているので、同じファイルを
+    同一プロセス内で複数の分析が参照しても走査は1回で済む。
+    """
+    path = Path(path)
+    pf = tuple(prefix_filter) if prefix_filter is not None else None
+    return _scan_once_cached(str(path), path.stat().st_mtime_ns, pf)
+
+
+@lru_cache(maxsize=4)
+def _scan_once_cached(path_str, mtime_ns, prefix_filter):
+    return _scan_once(Path(path_str), prefix_filter)
+
+
+def _scan_once(path, prefix_filter):
+    """scan_onceの実体。
+
+    プレビュー・行数・ContentDocumentId・プレフィックス分布・
+    IsDeleted分布を同じループで拾うので、ファイルのオープンと
+    トークナイズがファイルあたり1回で済む。存在しない列は単に
+    スキップする。
+    prefix_filterを渡すと、LinkedEntityIdのプレフィックスが一致する
+    行だけがunique_ids / id_sample / is_deleted_countsに入る
+    （prefix_countsは全行を数える）。
+    """
+    # internしたプレフィックスのfrozensetならinはほぼポインタ比較で済む
+    pf = (
+        frozenset(map(sys.intern, prefix_filter))
+        if prefix_filter is not None
+        else None
+    )
+    preview = []
+    # 全IDのリストを溜めてあとからset()にかけると、set分に加えて
+    # リストのエントリ分（28B/行）が余計に載る。最初からsetに入れ、
+    # 表示用のサンプルは先頭10件だけ別に持つ
+    unique_ids = set()
+    id_sample = []
+    # ループ中はCounterのハッシュテーブルよりdefaultdictの方が速い。
+    # 表示側が使うCounterへは走査後に一度だけ変換する
+    prefix_counts = defaultdict(int)
+    is_deleted_counts = defaultdict(int)
+    # どのみち全行をパースするループなので、行数もここで数える。
+    # count_newlines_mmap はファイルを読み直すことになる上、クォート内
+    # 改行があるとパーサの行数とズレるので、ここでは使わない
+    row_count = 0
+    with open(path, newline="", encoding="utf-8", buffering=READ_BUFFER) as f:
+        advise_sequential(f)
+        # DictReaderは行ごとにdictを作るので、ホットループでは
+        # csv.readerと整数インデックスで回す
+        reader = csv.reader(f)
+        header = next(reader)
+        cdi = header.index("ContentDocumentId")
+        lei = header.index("LinkedEntityId") if "LinkedEntityId" in header else -1
+        isd = header.index("IsDeleted") if "IsDeleted" in header else -1
+        # 毎行の属性解決を避けるためメソッドをローカルに束縛する
+        add_id = unique_ids.add
+        has_lei = lei >= 0
+        has_isd = isd >= 0
+        # 列の有無はヘッダで確定しているので、行ごとの存在チェックはしない
+        for row in reader:
+            row_count += 1
+            if len(preview) < 5:
+                preview.append(dict(zip(header, row)))
+            p3 = None
+            if has_lei:
+                lid = row[lei]
+                if len(lid) >= 3:
+                    # 行ごとのLinkedEntityIdを溜め込まず、その場でカウントする
+                    p3 = lid[:3]
+                    prefix_counts[p3] += 1
+            if pf is not None and p3 not in pf:
+                continue
+            cid = row[cdi]
+            if cid:
+                add_id(cid)
+                if len(id_sample) < 10:
+                    id_sample.append(cid)
+            if has_isd:
+                is_deleted_counts[row[isd]] += 1
+    return ScanResult(
+        headers=header,
+        preview=preview,
+        unique_ids=unique_ids,
+        id_sample=id_sample,
+        prefix_counts=Counter(prefix_counts),
+        is_deleted_counts=Counter(is_deleted_counts),
+        row_count=row_count,
+    )
+
+
+def scan_content_version(path):
+    """ContentVersion.csvを1パス走査した統計を返す。"""
+    return scan_once(path)
+
+
+def scan_content_link(path, *, prefix_filter=None):
+    """ContentDocumentLink.csvを1パス走査した統計を返す。"""
+    return scan_once(path, prefix_filter=prefix_filter)
+
+
+def cached_scan(path, columns=None):
+    """CSVの横に作ったParquetキャッシュをscanするLazyFrameを返す。
+
+    これらの分析は開発中に何度も実行するので、初回にsink_parquetで
+    Snappy+辞書エンコードのParquetを書き、CSVより新しいキャッシュが
+    ある間はscan_parquetで読む。IDは辞書ページに一度ずつしか
+    格納されないため、2回目以降はCSVの再トークナイズが丸ごと消える。
+    LazyFrame自体も（パス, mtime）でメモ化される。
+    """
+    path = Path(path)
+    cols = tuple(columns) if columns is not None else None
+    return _cached_scan(str(path), path.stat().st_mtime_ns, cols)
+
+
+@lru_cache(maxsize=4)
+def _cached_scan(path_str, mtime_ns, columns):
+    path = Path(path_str)
+    cache = path.with_suffix(".parquet")
+    if not cache.exists() or cache.stat().st_mtime < path.stat().st_mtime:
+        lf = pl.scan_csv(path)
+        if columns is not None:
+            lf = lf.select(list(columns))
+        lf.sink_parquet(cache, compression="snappy")
+    return pl.scan_parquet(cache)
+
+
+def read_csv_cudf(path, cols):
+    """byte_rangeで区切りながらcudfでCSVを読み、1つのDataFrameにする。
+
+    巨大なエクスポートでもGPUメモリのピークをチャンクサイズ程度に
+    抑えるため、2GBずつ読んで結合する。byte_rangeは範囲内で始まる
+    行だけを返すので、行の取りこぼしや重複はない。
+    """
+    size = Path(path).stat().st_size
+    if size <= GPU_BYTE_RANGE:
+        return cudf.read_csv(path, usecols=cols)
+    # ヘッダ行があるのは先頭チャンクだけ。後続チャンクをヘッダ推定の
+    # ままにすると各チャンクの先頭データ行がヘッダとして食われるので、
+    # 実ヘッダを読んでnames指定のheader=Noneで渡す（dask_cudfと同じ形）
+    with open(path, newline="", encoding="utf-8") as f:
+        names = next(csv.reader(f))
+    chunks = [cudf.read_csv(path, usecols=cols, byte_range=(0, GPU_BYTE_RANGE))]
+    for offset in range(GPU_BYTE_RANGE, size, GPU_BYTE_RANGE):
+        chunks.append(
+            cudf.read_csv(
+                path,
+                usecols=cols,
+                names=names,
+                header=None,
+                byte_range=(offset, GPU_BYTE_RANGE),
+            )
+        )
+    return cudf.concat(chunks, ignore_index=True)
+
+
+def open_csv_arrow(path, columns):
+    """指定列だけを読むpyarrowのストリーミングCSVリーダを返す。
+
+    空フィールドは""ではなくnullとして読む。デフォルトの
+    strings_can_be_null=Falseだと空のContentDocumentIdが実IDとして
+    数えられてしまい、drop_nullでも落とせない。
+    """
+    return pcsv.open_csv(
+        path,
+        read_options=pcsv.ReadOptions(block_size=64 << 20),
+        convert_options=pcsv.ConvertOptions(
+            include_columns=columns, strings_can_be_null=True
+        ),
+    )